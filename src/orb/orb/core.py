@@ -1098,6 +1098,7 @@ class ProgressBar(object):
     """
 
     REFRESH_COUNT = 3 # number of steps used to calculate a remaining time
+    REFRESH_TIME = 0.1 # minimum time between two displays in s
     MAX_CARAC = 78 # Maximum number of characters in a line
     BAR_LENGTH = 10. # Length of the bar
 
@@ -1116,6 +1117,7 @@ class ProgressBar(object):
         self._index_table = np.zeros((self.REFRESH_COUNT), float)
         self._silent = silent
         self._count = 0
+        self._last_update_time = None
         
     def _erase_line(self):
         """Erase the progress bar"""
@@ -1161,14 +1163,24 @@ class ProgressBar(object):
 
         :param nolog: (Optional) No logging of the printed text is
           made (default True).
+
+        .. note:: Updates are ignored if the last one is more recent
+          than :py:attr:`ProgressBar.REFRESH_TIME` so that it can be
+          called at each step of a loop.
         """
+        now = time.time()
+        if (self._last_update_time is not None
+            and now - self._last_update_time < self.REFRESH_TIME):
+            return
+        self._last_update_time = now
+        
         if (self._max_index > 0):
             color = TextColor.CYAN
             self._count += 1
             for _icount in range(self.REFRESH_COUNT - 1):
                 self._time_table[_icount] = self._time_table[_icount + 1]
                 self._index_table[_icount] = self._index_table[_icount + 1]
-            self._time_table[-1] = time.time()
+            self._time_table[-1] = now
             self._index_table[-1] = index
             index_by_step = ((self._index_table[-1] - self._index_table[0])
                              /float(self.REFRESH_COUNT - 1))
@@ -1221,6 +1233,7 @@ class ProgressBar(object):
         
         if not silent:
             self._erase_line()
+            self._last_update_time = None # last update is forced
             self.update(self._max_index, info="completed in " +
                         self._time_str_convert(
                             time.time() - self._start_time),
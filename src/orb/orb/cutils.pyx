@@ -2475,3 +2475,33 @@ def median2d(np.ndarray[np.float64_t, ndim=2] box):
                 nb = ii
                 break
     return box_s[(dimx-nb)/2]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def nansum_accumulate(np.ndarray[np.float64_t, ndim=2] im,
+                      np.ndarray[np.float64_t, ndim=3] frames):
+    """Add the sum along z of a set of frames to an image, in place
+    and with no GIL. NaNs are considered as zeros.
+
+    :param im: 2d image to which the sum is added (modified in place).
+
+    :param frames: 3d array of frames. Its first two dimensions must
+      be the same as the image.
+    """
+    cdef int ii, ij, ik
+    cdef int dimx, dimy, dimz
+    cdef double val
+    dimx = frames.shape[0]
+    dimy = frames.shape[1]
+    dimz = frames.shape[2]
+    if im.shape[0] != dimx or im.shape[1] != dimy:
+        raise ValueError('image shape ({}, {}) must be the same as the frames shape ({}, {})'.format(im.shape[0], im.shape[1], dimx, dimy))
+    with nogil:
+        for ii in range(dimx):
+            for ij in range(dimy):
+                val = 0
+                for ik in range(dimz):
+                    if not isnan(frames[ii,ij,ik]):
+                        val += frames[ii,ij,ik]
+                im[ii,ij] += val
@@ -1208,6 +1208,11 @@ class StandardSpectrum(RealSpectrum):
             m = _sim * np.polynomial.polynomial.polyval(np.arange(_sim.size), p)
             return np.array(m, dtype=float)
 
+        def model_jac(_sim, *p):
+            # model is linear in p: d model / d p_k = _sim * x**k
+            return np.array(_sim[:,np.newaxis] * np.polynomial.polynomial.polyvander(
+                np.arange(_sim.size), len(p) - 1), dtype=float)
+
         ff = orb.core.FilterFile(self.params.filter_name)
         
         if deg is None:
@@ -1238,7 +1243,7 @@ class StandardSpectrum(RealSpectrum):
         fit = scipy.optimize.curve_fit(
             model, sim.data, spe.data,
             p0=np.ones(deg+1, dtype=float)/10.,
-            sigma=sigma)
+            sigma=sigma, jac=model_jac)
         
         poly = np.polynomial.polynomial.polyval(
             np.arange(sim.dimx), fit[0])
@@ -7,6 +7,7 @@ import re
 import datetime
 import logging
 import warnings
+import operator
 
 import threading
 import socketserver
@@ -17,6 +18,7 @@ import select
 import socket
 
 import numpy as np
+import h5py
 import astropy.io.fits as pyfits
 import astropy.wcs as pywcs
 from scipy import interpolate
@@ -30,8 +32,10 @@ import orb.utils.parallel
 import orb.utils.io
 import orb.utils.filters
 import orb.utils.photometry
+import orb.utils.err
 from orb.core import ProgressBar
 import orb.core
+import orb.cutils
     
 
 
@@ -40,7 +44,7 @@ import orb.core
 ##################################################
 class Cube(orb.core.Tools):
     """3d numpy data cube handling. Base class for all Cube classes"""
-    def __init__(self, data, **kwargs):
+    def __init__(self, data, memmap=False, dtype=float, **kwargs):
         """
         Initialize Cube class.
 
@@ -48,7 +52,21 @@ class Cube(orb.core.Tools):
           cube or a 3d numpy.ndarray. Can be None if data init is
           handled differently (e.g. if this class is inherited)
 
+        :param memmap: (Optional) If True and if data is a path to a
+          FITS file, the file is memory-mapped and only the slices
+          requested via __getitem__ are read from the disk. Else the
+          whole cube is loaded in memory (default False).
+
+        :param dtype: (Optional) Data type of the cube. Data is
+          converted to this type when read (e.g. np.float32 halves the
+          memory used by the cube). Reductions (e.g. the mean image)
+          are always done in double precision (default float).
+
         :param kwargs: (Optional) :py:class:`~orb.core.Tools` kwargs.
+
+        .. note:: A numpy.ndarray passed as data is not copied if it
+          already has the requested dtype: the cube only keeps a
+          reference to it and never modifies it.
         """
         orb.core.Tools.__init__(self, **kwargs)
 
@@ -74,18 +92,35 @@ class Cube(orb.core.Tools):
 
 
         self.is_complex = False
-        self.dtype = float
+        self.dtype = np.dtype(dtype)
+
+        self._data = None # in-memory data, stays None if data is
+                          # accessed via __getitem__ (e.g. HDFCube)
+        self._section = None # section of a memory-mapped FITS cube
+        self._hdulist = None # HDU list of a memory-mapped FITS cube
+        self._fits_path = None # path to a memory-mapped FITS cube
+
+        # precomputed paths of HDF5 cubes (see _cache_hdf5_paths())
+        self._hdf5_frame_paths = list()
+        self._hdf5_quad_paths = list()
+        self._hdf5_data_paths = list()
+        self._hdf5_quad_data_paths = list()
         
         if data is None: return
         
         # check data
         if isinstance(data, str):
-            data = orb.utils.io.read_fits(data)
+            if memmap:
+                self._open_fits_section(data)
+                return
+            data = orb.utils.io.read_fits(data, dtype=self.dtype)
 
         orb.utils.validate.is_3darray(data)
-        orb.utils.validate.has_dtype(data, float)
+        if not np.issubdtype(data.dtype, np.floating):
+            raise orb.utils.err.ValidationError(
+                'data has type {} but should be a float array'.format(data.dtype))
         
-        self._data = np.copy(data)
+        self._data = np.asarray(data, dtype=self.dtype)
         self.dimx = self._data.shape[0]
         self.dimy = self._data.shape[1]
         self.dimz = self._data.shape[2]
@@ -93,50 +128,92 @@ class Cube(orb.core.Tools):
 
     def __getitem__(self, key):
         """Getitem special method"""
+        if self._fits_path is not None:
+            if self._section is None:
+                self._open_fits_section(self._fits_path)
+            # missing indices are full slices
+            if not isinstance(key, tuple): key = (key,)
+            key = key + (slice(None),) * (3 - len(key))
+            # FITS axes are in the reverse order (z, y, x)
+            return np.transpose(
+                self._section[key[::-1]]).astype(self.dtype)
         return self._data.__getitem__(key)
 
+    def __del__(self):
+        """Cube destructor"""
+        try:
+            self.close()
+        except Exception: pass
+
+    def close(self):
+        """Close the FITS file of a memory-mapped cube. It will be
+        opened again at the next data access.
+        """
+        if self._hdulist is not None:
+            self._hdulist.close()
+            self._hdulist = None
+            self._section = None
+
+    def _open_fits_section(self, fits_path):
+        """Open a FITS cube in memory-mapped mode. Data is then read
+        on demand from the section of its HDU.
+
+        :param fits_path: Path to the FITS cube.
+        """
+        self._fits_path = fits_path
+        self._hdulist = pyfits.open(fits_path, memmap=True, mode='denywrite')
+        # the data HDU is found from the headers: accessing the data
+        # of an HDU (e.g. with orb.utils.io.get_hdu_data_index) would
+        # load it in memory if it is scaled (BZERO/BSCALE)
+        hdu = None
+        for ihdu in self._hdulist:
+            if ihdu.header.get('NAXIS', 0) > 0:
+                hdu = ihdu
+                break
+        if hdu is None:
+            self.close()
+            raise Exception('No data recorded in FITS file')
+        if hdu.header['NAXIS'] != 3:
+            self.close()
+            raise TypeError('FITS data has {} dims but must have exactly 3 dimensions'.format(hdu.header['NAXIS']))
+
+        # same check as for data loaded in memory: integer data is
+        # only accepted if it is scaled to floats
+        bitpix = hdu.header['BITPIX']
+        bscale = hdu.header.get('BSCALE', 1)
+        bzero = hdu.header.get('BZERO', 0)
+        if bitpix > 0 and bscale == 1 and bzero in (0, 2**(bitpix - 1)):
+            self.close()
+            raise orb.utils.err.ValidationError(
+                'data has BITPIX {} but should be a float array'.format(bitpix))
+        
+        self._section = hdu.section
+        self.dimx = hdu.header['NAXIS1']
+        self.dimy = hdu.header['NAXIS2']
+        self.dimz = hdu.header['NAXIS3']
+        self.shape = (self.dimx, self.dimy, self.dimz)
+
     def _get_default_slice(self, _slice, _max):
         """Utility function used by __getitem__. Return a valid slice
         object given an integer or slice.
 
         :param _slice: a slice object or an integer
         :param _max: size of the considered axis of the slice.
+
+        .. note:: Indices are handled like Python sequence indices
+          (negative indices are counted from the end and slice bounds
+          are clipped) but the returned slice cannot be empty.
         """
         if isinstance(_slice, slice):
-            if _slice.start is not None:
-                if (isinstance(_slice.start, int)
-                    or isinstance(_slice.start, int)):
-                    if (_slice.start >= 0) and (_slice.start <= _max):
-                        slice_min = int(_slice.start)
-                    else:
-                        raise Exception(
-                            "Index error: list index out of range")
-                else:
-                    raise Exception("Type error: list indices of slice must be integers")
-            else: slice_min = 0
-
-            if _slice.stop is not None:
-                if (isinstance(_slice.stop, int)
-                    or isinstance(_slice.stop, int)):
-                    if _slice.stop < 0: # transform negative index to real index
-                        slice_stop = _max + _slice.stop
-                    else:  slice_stop = _slice.stop
-                    if ((slice_stop <= _max)
-                        and slice_stop > slice_min):
-                        slice_max = int(slice_stop)
-                    else:
-                        raise Exception(
-                            "Index error: list index out of range")
-
-                else:
-                    raise Exception("Type error: list indices of slice must be integers")
-            else: slice_max = _max
-
-        elif isinstance(_slice, int) or isinstance(_slice, int):
-            slice_min = _slice
-            slice_max = slice_min + 1
+            slice_min, slice_max, _ = _slice.indices(_max)
+            if slice_max <= slice_min:
+                raise IndexError("Index error: list index out of range")
         else:
-            raise Exception("Type error: list indices must be integers or slices")
+            slice_min = operator.index(_slice)
+            if slice_min < 0: slice_min += _max
+            if not 0 <= slice_min < _max:
+                raise IndexError("Index error: list index out of range")
+            slice_max = slice_min + 1
         return slice(slice_min, slice_max, 1)
 
 
@@ -149,6 +226,8 @@ class Cube(orb.core.Tools):
           returned (default False).
         """
         if mask: return self._get_hdf5_frame_path(frame_index) + '/mask'
+        elif 0 <= frame_index < len(self._hdf5_data_paths):
+            return self._hdf5_data_paths[frame_index]
         else: return self._get_hdf5_frame_path(frame_index) + '/data'
 
     def _get_hdf5_quad_data_path(self, quad_index):
@@ -156,6 +235,8 @@ class Cube(orb.core.Tools):
 
         :param quad_index: Index of the quadrant
         """
+        if 0 <= quad_index < len(self._hdf5_quad_data_paths):
+            return self._hdf5_quad_data_paths[quad_index]
         return self._get_hdf5_quad_path(quad_index) + '/data'
         
 
@@ -178,6 +259,8 @@ class Cube(orb.core.Tools):
 
         :param frame_index: Index of the frame.
         """
+        if 0 <= frame_index < len(self._hdf5_frame_paths):
+            return self._hdf5_frame_paths[frame_index]
         return 'frame{:05d}'.format(frame_index)
 
     
@@ -186,8 +269,46 @@ class Cube(orb.core.Tools):
 
         :param quad_index: Index of the quad.
         """
+        if 0 <= quad_index < len(self._hdf5_quad_paths):
+            return self._hdf5_quad_paths[quad_index]
         return 'quad{:03d}'.format(quad_index)
 
+    def _cache_hdf5_paths(self, frame_nb, quad_nb=None):
+        """Compute once the paths to the frames and quads of an HDF5
+        cube so that they are not formatted at each data access.
+
+        :param frame_nb: Number of frames.
+
+        :param quad_nb: (Optional) Number of quads (default None).
+        """
+        # lists are emptied first so that paths are formatted here
+        self._hdf5_frame_paths = list()
+        self._hdf5_quad_paths = list()
+        self._hdf5_data_paths = list()
+        self._hdf5_quad_data_paths = list()
+        
+        frame_paths = [self._get_hdf5_frame_path(ik) for ik in range(frame_nb)]
+        data_paths = [self._get_hdf5_data_path(ik) for ik in range(frame_nb)]
+        if quad_nb is not None:
+            quad_paths = [self._get_hdf5_quad_path(iquad) for iquad in range(quad_nb)]
+            quad_data_paths = [self._get_hdf5_quad_data_path(iquad)
+                               for iquad in range(quad_nb)]
+        else:
+            quad_paths = list()
+            quad_data_paths = list()
+            
+        self._hdf5_frame_paths = frame_paths
+        self._hdf5_quad_paths = quad_paths
+        self._hdf5_data_paths = data_paths
+        self._hdf5_quad_data_paths = quad_data_paths
+
+    def _get_hdf5_cube_path(self):
+        """Return path to the consolidated data of an HDF5 cube (all
+        the frames written in a single 3d dataset, see
+        :py:meth:`HDFCube.consolidate`).
+        """
+        return 'cube'
+
     def get_data(self, x_min, x_max, y_min, y_max,
                  z_min, z_max, silent=False, mask=False):
         """Return a part of the data cube.
@@ -218,24 +339,49 @@ class Cube(orb.core.Tools):
         self._return_mask = False
         return data
         
-    def get_mean_image(self, recompute=False):
+    def _get_mean_image_step_size(self):
+        """Return the default number of frames loaded at once to
+        compute the mean image. Frames are loaded one by one: loading
+        blocks of frames does not save any read but multiplies the
+        memory used.
+        """
+        return 1
+
+    def get_mean_image(self, recompute=False, step_size=None):
         """Return the mean image of a cube (corresponding to a deep
         frame for an interferogram cube or a specral cube).
 
         :param recompute: (Optional) Force to recompute mean image
           even if it is already present in the cube (default False).
+
+        :param step_size: (Optional) Number of frames loaded at once
+          when the data is not already in memory. If None, it is
+          given by :py:meth:`Cube._get_mean_image_step_size` (default
+          None).
         
         .. note:: In this process NaNs are considered as zeros.
         """
+        if step_size is None:
+            step_size = self._get_mean_image_step_size()
         if self.mean_image is None or recompute:
-            mean_im = np.zeros((self.dimx, self.dimy), dtype=self.dtype)
-            progress = ProgressBar(self.dimz)
-            for _ik in range(self.dimz):
-                frame = self[:,:,_ik]
-                non_nans = np.nonzero(~np.isnan(frame))
-                mean_im[non_nans] += frame[non_nans]
-                progress.update(_ik, info="Creating mean image")
-            progress.end()
+            sum_dtype = np.result_type(self.dtype, np.float64)
+            if isinstance(self._data, np.ndarray):
+                mean_im = np.nansum(self._data, axis=2, dtype=sum_dtype)
+            else:
+                mean_im = np.zeros((self.dimx, self.dimy), dtype=sum_dtype)
+                progress = ProgressBar(self.dimz)
+                for ik in range(0, self.dimz, step_size):
+                    progress.update(ik, info="Creating mean image")
+                    frames = self.get_data(
+                        0, self.dimx, 0, self.dimy,
+                        ik, min(ik + step_size, self.dimz), silent=True)
+                    # frames may have been squeezed by __getitem__
+                    frames = np.reshape(frames, (self.dimx, self.dimy, -1))
+                    if frames.dtype == np.float64:
+                        orb.cutils.nansum_accumulate(mean_im, frames)
+                    else:
+                        mean_im += np.nansum(frames, axis=2, dtype=sum_dtype)
+                progress.end()
             self.mean_image = mean_im / self.dimz
         return self.mean_image            
             
@@ -268,10 +414,22 @@ class HDFCube(Cube):
       dataset *frame00000/data*)
 
     * A **mask** dataset can be added to each frame.
-    """        
+
+    * The frames can also be consolidated in a single 3d **cube**
+      dataset (see :py:meth:`HDFCube.consolidate`). In this case the
+      data is read from this dataset, which requires only one call
+      to HDF5 for any slice of the cube.
+    """
+    CHUNK_SIZE = 1000000 # approximate size in bytes of a chunk of
+                         # the consolidated dataset (the default
+                         # HDF5 chunk cache size is 1 MiB)
+    CONSOLIDATED_ORDERS = ('xyz', 'zxy') # possible axes orders of
+                                         # the consolidated dataset
+    
     def __init__(self, cube_path, params=None,
                  silent_init=False,
-                 binning=None, **kwargs):
+                 binning=None, consolidate=False, dtype=None,
+                 chunk_cache_mb=64, **kwargs):
         
         """
         Initialize HDFCube class.
@@ -294,11 +452,31 @@ class HDFCube(Cube):
 
         :param silent_init: (Optional) If True Init is silent (default False).
 
+        :param consolidate: (Optional) If True and if the cube is
+          frame based, the frames are consolidated in a single 3d
+          dataset if it is not already done (default False). See
+          :py:meth:`HDFCube.consolidate`.
+
+        :param dtype: (Optional) Data type of the returned data. If
+          None, data is returned in double precision (complex or
+          float). Can be set to e.g. np.float32 to halve the memory
+          used when loading data (default None).
+
+        :param chunk_cache_mb: (Optional) Size in MiB of the HDF5
+          chunk cache of a dataset consolidated in 'zxy' order (see
+          :py:meth:`HDFCube.consolidate`). A cache large enough to
+          hold the chunks read repeatedly avoids reading them again
+          from the disk at each access. Other datasets use the HDF5
+          default cache (default 64).
+
         :param kwargs: Kwargs are :py:class:`~core.Tools` properties.
         """
         Cube.__init__(self, None, **kwargs)
             
-        self._hdf5f = None # Instance of h5py.File
+        self._hdf5f = None # Instance of h5py.File (kept open, see
+                           # HDFCube._get_hdf5f())
+        self._hdf5_datasets = dict() # cached h5py.Dataset instances
+        self._chunk_cache_mb = float(chunk_cache_mb)
         self.quad_nb = None # number of quads (set to None if HDFCube
                             # is not a cube split in quads but a cube
                             # split in frames)
@@ -308,88 +486,113 @@ class HDFCube(Cube):
         
         self.is_hdf5_cube = True
         self.is_hdf5_frames = False
-        self.image_list = None
+        self._image_list = None # read on first access
+        self._has_image_list = False
         self._prebinning = None
         if binning is not None:
             if int(binning) > 1:
                 self._prebinning = int(binning)
             
         self._parallel_access_to_data = False
+        self._consolidated = False # True if the frames are also
+                                   # stored in a single 3d dataset
+        self._consolidated_order = None # axes order of the
+                                        # consolidated dataset
 
         if cube_path is None or cube_path == '': return
         
-        with orb.utils.io.open_hdf5(cube_path, 'r') as f:
-            self.cube_path = cube_path
-            self.dimz = self._get_attribute('dimz')
-            self.dimx = self._get_attribute('dimx')
-            self.dimy = self._get_attribute('dimy')
-            if 'image_list' in f:
-                self.image_list = f['image_list'][:]
+        self.cube_path = cube_path
+        f = self._get_hdf5f()
+        self.dimz = self._get_attribute('dimz')
+        self.dimx = self._get_attribute('dimx')
+        self.dimy = self._get_attribute('dimy')
+        self._has_image_list = 'image_list' in f
+
+        # check if cube is quad or frames based
+        self.quad_nb = self._get_attribute('quad_nb', optional=True)
+        if self.quad_nb is not None:
+            self.is_quad_cube = True
+        else:
+            self.is_quad_cube = False
+        self._cache_hdf5_paths(self.dimz, quad_nb=self.quad_nb)
+
+        # sanity check
+        if self.is_quad_cube:
+            quad_nb = len(
+                [igrp for igrp in f
+                 if 'quad' == igrp[:4]])
+            if quad_nb != self.quad_nb:
+                raise Exception("Corrupted HDF5 cube: 'quad_nb' attribute ([]) does not correspond to the real number of quads ({})".format(self.quad_nb, quad_nb))
+
+            if self._get_hdf5_quad_path(0) in f:
+                # test whether data is complex
+                if np.iscomplexobj(f[self._get_hdf5_quad_data_path(0)]):
+                    self.is_complex = True
+                    self.dtype = complex
+                else:
+                    self.is_complex = False
+                    self.dtype = float
             
-            # check if cube is quad or frames based
-            self.quad_nb = self._get_attribute('quad_nb', optional=True)
-            if self.quad_nb is not None:
-                self.is_quad_cube = True
             else:
-                self.is_quad_cube = False
-        
-            # sanity check
-            if self.is_quad_cube:
-                quad_nb = len(
-                    [igrp for igrp in f
-                     if 'quad' == igrp[:4]])
-                if quad_nb != self.quad_nb:
-                    raise Exception("Corrupted HDF5 cube: 'quad_nb' attribute ([]) does not correspond to the real number of quads ({})".format(self.quad_nb, quad_nb))
-
-                if self._get_hdf5_quad_path(0) in f:
-                    # test whether data is complex
-                    if np.iscomplexobj(f[self._get_hdf5_quad_data_path(0)]):
-                        self.is_complex = True
-                        self.dtype = complex
-                    else:
-                        self.is_complex = False
-                        self.dtype = float
+                raise Exception('{} is missing. A valid HDF5 cube must contain at least one quadrant'.format(
+                    self._get_hdf5_quad_path(0)))
                 
-                else:
-                    raise Exception('{} is missing. A valid HDF5 cube must contain at least one quadrant'.format(
-                        self._get_hdf5_quad_path(0)))
-                    
 
-            else:
-                frame_nb = len(
-                    [igrp for igrp in f
-                     if 'frame' == igrp[:5]])
-
-                if frame_nb != self.dimz:
-                    raise Exception("Corrupted HDF5 cube: 'dimz' attribute ({}) does not correspond to the real number of frames ({})".format(self.dimz, frame_nb))
-                
+        else:
+            # frames are numbered from 0 to dimz - 1: checking the
+            # last frame avoids a scan of all the groups of the file
+            if (self._get_hdf5_frame_path(self.dimz - 1) not in f
+                or self._get_hdf5_frame_path(self.dimz) in f):
+                raise Exception("Corrupted HDF5 cube: 'dimz' attribute ({}) does not correspond to the real number of frames".format(self.dimz))
             
-                if self._get_hdf5_frame_path(0) in f:                
-                    if ((self.dimx, self.dimy)
-                        != f[self._get_hdf5_data_path(0)].shape):
-                        raise Exception('Corrupted HDF5 cube: frame shape {} does not correspond to the attributes of the file {}x{}'.format(f[self._get_hdf5_data_path(0)].shape, self.dimx, self.dimy))
 
-                    if self._get_hdf5_data_path(0, mask=True) in f:
-                        self._mask_exists = True
-                    else:
-                        self._mask_exists = False
+            if self._get_hdf5_frame_path(0) in f:                
+                if ((self.dimx, self.dimy)
+                    != f[self._get_hdf5_data_path(0)].shape):
+                    raise Exception('Corrupted HDF5 cube: frame shape {} does not correspond to the attributes of the file {}x{}'.format(f[self._get_hdf5_data_path(0)].shape, self.dimx, self.dimy))
 
-                    # test whether data is complex
-                    if np.iscomplexobj(f[self._get_hdf5_data_path(0)]):
-                        self.is_complex = True
-                        self.dtype = complex
-                    else:
-                        self.is_complex = False
-                        self.dtype = float
+                if self._get_hdf5_data_path(0, mask=True) in f:
+                    self._mask_exists = True
                 else:
-                    raise Exception('{} is missing. A valid HDF5 cube must contain at least one frame'.format(
-                        self._get_hdf5_frame_path(0)))
-                
+                    self._mask_exists = False
+
+                # test whether data is complex
+                if np.iscomplexobj(f[self._get_hdf5_data_path(0)]):
+                    self.is_complex = True
+                    self.dtype = complex
+                else:
+                    self.is_complex = False
+                    self.dtype = float
+            else:
+                raise Exception('{} is missing. A valid HDF5 cube must contain at least one frame'.format(
+                    self._get_hdf5_frame_path(0)))
+
+            if self._get_hdf5_cube_path() in f:
+                # the order attribute is written once the
+                # consolidation is complete
+                order = f[self._get_hdf5_cube_path()].attrs.get('order', None)
+                if isinstance(order, bytes):
+                    order = order.decode()
+                if order in self.CONSOLIDATED_ORDERS:
+                    self._consolidated = True
+                    self._consolidated_order = order
+                else:
+                    logging.warning('consolidated dataset is incomplete and will be ignored (consolidate the cube again to replace it)')
+
+        if dtype is not None:
+            if self.is_complex:
+                self.dtype = np.result_type(dtype, np.complex64)
+            else:
+                self.dtype = np.dtype(dtype)
+
+        if consolidate and not self.is_quad_cube:
+            self.consolidate()
 
         # binning
         if self._prebinning is not None:
-            self.dimx = self.dimx / self._prebinning
-            self.dimy = self.dimy / self._prebinning
+            # incomplete bins are dropped (see utils.image.nanbin_image)
+            self.dimx = int(self.dimx) // self._prebinning
+            self.dimy = int(self.dimy) // self._prebinning
 
         if (self.dimx) and (self.dimy) and (self.dimz):
             if not silent_init:
@@ -406,6 +609,232 @@ class HDFCube(Cube):
         if params is not None:
             self.compute_data_parameters()
 
+    @property
+    def image_list(self):
+        """List of the images of the cube (None if the cube has no
+        image list). It is read from the file on first access."""
+        if self._image_list is None and self._has_image_list:
+            self._image_list = self._get_hdf5f()['image_list'][:]
+        return self._image_list
+
+    def __getstate__(self):
+        """Used to pickle object (the HDF5 file handle is not pickled)"""
+        state = self.__dict__.copy()
+        state['_hdf5f'] = None
+        state['_hdf5_datasets'] = dict()
+        return state
+
+    def __del__(self):
+        """HDFCube destructor"""
+        try:
+            self.close()
+        except Exception: pass
+
+    def _get_hdf5f(self):
+        """Return the h5py.File instance of the cube. The file is
+        opened in read-only mode at the first call and kept open so
+        that the HDF5 metadata and chunk cache are not lost between
+        two data accesses.
+        """
+        if self._hdf5f is None:
+            self._hdf5f = orb.utils.io.open_hdf5(self.cube_path, 'r')
+        return self._hdf5f
+
+    def _get_chunk_cache(self):
+        """Return the chunk cache parameters (rdcc_nbytes,
+        rdcc_nslots, rdcc_w0) of a dataset consolidated in 'zxy'
+        order.
+
+        The number of slots is a prime number (to limit hash
+        collisions) about 100 times larger than the number of chunks
+        of :py:attr:`HDFCube.CHUNK_SIZE` bytes fitting in the cache.
+        """
+        nbytes = int(self._chunk_cache_mb * (1 << 20))
+        nslots = max(521, 100 * nbytes // self.CHUNK_SIZE)
+        while any(nslots % i == 0 for i in range(2, int(np.sqrt(nslots)) + 1)):
+            nslots += 1
+        return nbytes, nslots, 0.75
+
+    def _get_hdf5_dataset(self, path):
+        """Return an h5py.Dataset instance of the cube. Datasets are
+        cached so that the path is resolved only at the first call.
+
+        :param path: Path to the dataset.
+        """
+        try:
+            return self._hdf5_datasets[path]
+        except KeyError:
+            if (path == self._get_hdf5_cube_path()
+                and self._consolidated_order == 'zxy'):
+                # zxy chunks are small and read repeatedly (e.g. by
+                # the spectra of neighbouring pixels), a large cache
+                # is given to this dataset only. Other datasets keep
+                # the default cache (1 MiB) which is bypassed by large
+                # chunks (e.g. whole frames of an xyz dataset) so that
+                # small selections are not read chunk by chunk.
+                nbytes, nslots, w0 = self._get_chunk_cache()
+                dapl = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+                dapl.set_chunk_cache(nslots, nbytes, w0)
+                dset = h5py.Dataset(h5py.h5d.open(
+                    self._get_hdf5f().id, path.encode(), dapl=dapl))
+            else:
+                dset = self._get_hdf5f()[path]
+            self._hdf5_datasets[path] = dset
+            return dset
+
+    def close(self):
+        """Close the HDF5 file of the cube. It will be opened again at
+        the next data access.
+        """
+        self._hdf5_datasets = dict()
+        if self._hdf5f is not None:
+            self._hdf5f.close()
+            self._hdf5f = None
+
+    def consolidate(self, order='xyz', chunks=None):
+        """Write all the frames of a frame based cube in a single 3d
+        dataset.
+
+        Any slice of the cube can then be read with only one call to
+        HDF5 instead of one call per frame. Frame datasets are kept
+        untouched (masks are still read from them).
+
+        :param order: (Optional) Order of the axes of the dataset. Can
+          be 'xyz' (frames are contiguous, best for imaging) or 'zxy'
+          (spectra are contiguous, best when the cube is mostly
+          accessed spectrum by spectrum) (default 'xyz').
+
+        :param chunks: (Optional) Chunk shape of the dataset (in the
+          order of its axes). If None, chunks are made of full frames
+          for 'xyz' order and of full spectra for 'zxy' order, with a
+          size of approximately :py:attr:`HDFCube.CHUNK_SIZE` bytes
+          (default None).
+
+        .. warning:: This doubles the size of the HDF5 file.
+        """
+        if self.is_quad_cube:
+            raise Exception('Only frame based cubes can be consolidated')
+        if order not in self.CONSOLIDATED_ORDERS:
+            raise ValueError('order must be in {}'.format(self.CONSOLIDATED_ORDERS))
+        if self._consolidated: return
+        
+        self.close() # the file cannot be opened for writing while
+                     # it is opened in read-only mode
+        with orb.utils.io.open_hdf5(self.cube_path, 'a') as f:
+            # remove an incomplete dataset left by an interrupted
+            # consolidation
+            if self._get_hdf5_cube_path() in f:
+                del f[self._get_hdf5_cube_path()]
+            frame0 = f[self._get_hdf5_data_path(0)]
+            dimx, dimy = frame0.shape
+            itemsize = frame0.dtype.itemsize
+            if order == 'xyz':
+                shape = (dimx, dimy, self.dimz)
+                if chunks is None:
+                    chunk_z = max(1, self.CHUNK_SIZE // (dimx * dimy * itemsize))
+                    chunks = (dimx, dimy, int(min(chunk_z, self.dimz)))
+            else:
+                shape = (self.dimz, dimx, dimy)
+                if chunks is None:
+                    chunk_xy = max(1, int(np.sqrt(
+                        self.CHUNK_SIZE // (self.dimz * itemsize))))
+                    chunks = (self.dimz, int(min(chunk_xy, dimx)),
+                              int(min(chunk_xy, dimy)))
+            cube = f.create_dataset(
+                self._get_hdf5_cube_path(), shape=shape,
+                dtype=frame0.dtype, chunks=tuple(chunks))
+
+            if order == 'xyz':
+                # blocks of frames are written
+                progress = ProgressBar(self.dimz)
+                for ik in range(0, self.dimz, chunks[2]):
+                    progress.update(ik, info='Consolidating cube')
+                    ik_max = min(ik + chunks[2], self.dimz)
+                    frames = np.empty((dimx, dimy, ik_max - ik), dtype=frame0.dtype)
+                    for ij in range(ik, ik_max):
+                        frames[:,:,ij - ik] = f[self._get_hdf5_data_path(ij)][:]
+                    cube[:,:,ik:ik_max] = frames
+            else:
+                # stripes of spectra (one chunk wide along x) are
+                # written so that each chunk is written only once
+                progress = ProgressBar(dimx)
+                for ii in range(0, dimx, chunks[1]):
+                    progress.update(ii, info='Consolidating cube')
+                    ii_max = min(ii + chunks[1], dimx)
+                    stripe = np.empty((self.dimz, ii_max - ii, dimy), dtype=frame0.dtype)
+                    for ik in range(self.dimz):
+                        stripe[ik] = f[self._get_hdf5_data_path(ik)][ii:ii_max, :]
+                    cube[:,ii:ii_max,:] = stripe
+            progress.end()
+            
+            # written last: a dataset without order attribute is an
+            # incomplete one (see HDFCube.__init__)
+            cube.attrs['order'] = order
+            
+        self._consolidated_order = order
+        self._consolidated = True
+
+    def _get_mean_image_step_size(self):
+        """Return the default number of frames loaded at once to
+        compute the mean image.
+
+        Frames stored in their own dataset are loaded one by one. If
+        the cube is consolidated in 'xyz' order, a block of frames is
+        one chunk of the dataset so that it is read in one call.
+        """
+        if self._consolidated_order == 'xyz':
+            return self._get_hdf5_dataset(self._get_hdf5_cube_path()).chunks[2]
+        return 1
+
+    def get_mean_image(self, recompute=False, step_size=None):
+        """Return the mean image of a cube (corresponding to a deep
+        frame for an interferogram cube or a specral cube).
+
+        :param recompute: (Optional) Force to recompute mean image
+          even if it is already present in the cube (default False).
+
+        :param step_size: (Optional) Number of frames loaded at once
+          when the data is loaded frame by frame. If None, it is
+          given by :py:meth:`HDFCube._get_mean_image_step_size`
+          (default None).
+
+        .. note:: If the cube is consolidated with contiguous spectra
+          ('zxy' order, see :py:meth:`HDFCube.consolidate`), the mean
+          image is computed tile by tile, each tile corresponding to
+          one chunk of the dataset, so that each chunk is read only
+          once. Else frames are loaded by blocks of step_size frames.
+        
+        .. note:: In this process NaNs are considered as zeros.
+        """
+        if self._consolidated_order != 'zxy':
+            return Cube.get_mean_image(
+                self, recompute=recompute, step_size=step_size)
+        
+        if self.mean_image is None or recompute:
+            dimx, dimy = int(self.dimx), int(self.dimy)
+            chunks = self._get_hdf5_dataset(self._get_hdf5_cube_path()).chunks
+            binning = self._prebinning if self._prebinning is not None else 1
+            tile_x = max(1, chunks[1] // binning)
+            tile_y = max(1, chunks[2] // binning)
+            
+            sum_dtype = np.result_type(self.dtype, np.float64)
+            mean_im = np.zeros((dimx, dimy), dtype=sum_dtype)
+            progress = ProgressBar(dimx)
+            for ii in range(0, dimx, tile_x):
+                progress.update(ii, info="Creating mean image")
+                ii_max = min(ii + tile_x, dimx)
+                for ij in range(0, dimy, tile_y):
+                    ij_max = min(ij + tile_y, dimy)
+                    tile = self.get_data(ii, ii_max, ij, ij_max,
+                                         0, self.dimz, silent=True)
+                    # tile may have been squeezed by __getitem__
+                    tile = np.reshape(tile, (ii_max - ii, ij_max - ij, -1))
+                    mean_im[ii:ii_max, ij:ij_max] = np.nansum(
+                        tile, axis=2, dtype=sum_dtype)
+            progress.end()
+            self.mean_image = mean_im / self.dimz
+        return self.mean_image
+
         
     def __getitem__(self, key):
         """Implement the evaluation of self[key].
@@ -413,12 +842,6 @@ class HDFCube(Cube):
         .. note:: To make this function silent just set
           Cube()._silent_load to True.
         """
-        def slice_in_quad(ax_slice, ax_min, ax_max):
-            ax_range = list(range(ax_min, ax_max))
-            for ii in range(ax_slice.start, ax_slice.stop):
-                if ii in ax_range:
-                    return True
-            return False
         # check return mask possibility
         if self._return_mask and not self._mask_exists:
             raise Exception("No mask found with data, cannot return mask")
@@ -428,9 +851,9 @@ class HDFCube(Cube):
         y_slice = self._get_default_slice(key[1], self.dimy)
         z_slice = self._get_default_slice(key[2], self.dimz)
 
-        data = np.empty((x_slice.stop - x_slice.start,
-                         y_slice.stop - y_slice.start,
-                         z_slice.stop - z_slice.start), dtype=self.dtype)
+        data_shape = (x_slice.stop - x_slice.start,
+                      y_slice.stop - y_slice.start,
+                      z_slice.stop - z_slice.start)
 
         if self._prebinning is not None:
             x_slice = slice(x_slice.start * self._prebinning,
@@ -446,54 +869,126 @@ class HDFCube(Cube):
             else:
                 only_one_frame = False
 
-            with orb.utils.io.open_hdf5(self.cube_path, 'r') as f:
-                if not self._silent_load and not only_one_frame:
-                    progress = ProgressBar(z_slice.stop - z_slice.start - 1)
+            use_consolidated = self._consolidated and not self._return_mask
+            # a frame spans all the chunks of a 'zxy' dataset: frames
+            # are read from their own dataset
+            if self._consolidated_order == 'zxy' and only_one_frame:
+                use_consolidated = False
+
+            # only one frame: read directly into a 2d array
+            if only_one_frame and not use_consolidated:
+                dset = self._get_hdf5_dataset(self._get_hdf5_data_path(
+                    z_slice.start, mask=self._return_mask))
+                frame = np.empty(data_shape[:2], dtype=self.dtype)
+                if self._prebinning is not None:
+                    orb.utils.image.nanbin_image(
+                        dset[x_slice, y_slice], self._prebinning, out=frame)
+                elif self._return_mask:
+                    frame[:] = dset[x_slice, y_slice]
+                else:
+                    dset.read_direct(frame, source_sel=np.s_[x_slice, y_slice])
+                return np.squeeze(frame)
 
-                for ik in range(z_slice.start, z_slice.stop):
-                    unbin_data = f[
-                        self._get_hdf5_data_path(
-                            ik, mask=self._return_mask)][x_slice, y_slice]
+            data = np.empty(data_shape, dtype=self.dtype)
 
+            # consolidated cube: the whole slice is read at once
+            if use_consolidated:
+                cube = self._get_hdf5_dataset(self._get_hdf5_cube_path())
+                if self._consolidated_order == 'zxy':
+                    unbin_data = np.transpose(
+                        cube[z_slice, x_slice, y_slice], (1, 2, 0))
                     if self._prebinning is not None:
-                        data[0:x_slice.stop - x_slice.start,
-                             0:y_slice.stop - y_slice.start,
-                             ik - z_slice.start] = orb.utils.image.nanbin_image(
-                            unbin_data, self._prebinning)
+                        orb.utils.image.nanbin_image(
+                            unbin_data, self._prebinning, out=data)
+                    else:
+                        data[:] = unbin_data
+                elif self._prebinning is not None:
+                    orb.utils.image.nanbin_image(
+                        cube[x_slice, y_slice, z_slice],
+                        self._prebinning, out=data)
+                else:
+                    cube.read_direct(data, source_sel=np.s_[
+                        x_slice, y_slice, z_slice])
+                return np.squeeze(data)
+
+            if not self._silent_load:
+                progress = ProgressBar(z_slice.stop - z_slice.start - 1)
+
+            # HDF5 selections are created only once since all the
+            # frames have the same shape. This matters when the
+            # slice is small (e.g. a spectrum), in which case the
+            # cost of a read is dominated by its overhead.
+            file_space = None
+            mem_space = None
+            # unbinned frames are all read in the same buffer
+            if self._prebinning is not None:
+                unbin_buf = np.empty(
+                    (x_slice.stop - x_slice.start,
+                     y_slice.stop - y_slice.start), dtype=self.dtype)
+            for ik in range(z_slice.start, z_slice.stop):
+                dset = self._get_hdf5_dataset(self._get_hdf5_data_path(
+                    ik, mask=self._return_mask))
+
+                if self._prebinning is not None:
+                    if self._return_mask:
+                        unbin_buf[:] = dset[x_slice, y_slice]
                     else:
-                        data[0:x_slice.stop - x_slice.start,
-                             0:y_slice.stop - y_slice.start,
-                             ik - z_slice.start] = unbin_data
+                        dset.read_direct(
+                            unbin_buf, source_sel=np.s_[x_slice, y_slice])
+                    orb.utils.image.nanbin_image(
+                        unbin_buf, self._prebinning,
+                        out=data[:, :, ik - z_slice.start])
+                elif self._return_mask:
+                    data[0:x_slice.stop - x_slice.start,
+                         0:y_slice.stop - y_slice.start,
+                         ik - z_slice.start] = dset[x_slice, y_slice]
+                else:
+                    # frame is read directly into the output array
+                    if file_space is None:
+                        file_space = h5py.h5s.create_simple(dset.shape)
+                        file_space.select_hyperslab(
+                            (x_slice.start, y_slice.start), data.shape[:2])
+                        mem_space = h5py.h5s.create_simple(data.shape)
+                    mem_space.select_hyperslab(
+                        (0, 0, ik - z_slice.start), data.shape[:2] + (1,))
+                    dset.id.read(mem_space, file_space, data)
 
-                    if not self._silent_load and not only_one_frame:
-                        if not ik%100:
-                            progress.update(ik - z_slice.start, info="Loading data")
+                if not self._silent_load:
+                    progress.update(ik - z_slice.start, info="Loading data")
 
-                if not self._silent_load and not only_one_frame:
-                    progress.end()
+            if not self._silent_load:
+                progress.end()
 
         # quad based cube
         else:
-            with orb.utils.io.open_hdf5(self.cube_path, 'r') as f:
-                if not self._silent_load:
-                    progress = ProgressBar(self.quad_nb)
-                for iquad in range(self.quad_nb):
-                    if not self._silent_load:
-                        progress.update(iquad, info='Loading data')
-                    x_min, x_max, y_min, y_max = self._get_quadrant_dims(
-                        iquad, self.dimx, self.dimy, int(np.sqrt(float(self.quad_nb))))
-                    if slice_in_quad(x_slice, x_min, x_max) and slice_in_quad(y_slice, y_min, y_max):
-                        data[max(x_min, x_slice.start) - x_slice.start:
-                             min(x_max, x_slice.stop) - x_slice.start,
-                             max(y_min, y_slice.start) - y_slice.start:
-                             min(y_max, y_slice.stop) - y_slice.start,
-                             0:z_slice.stop-z_slice.start] = f[self._get_hdf5_quad_data_path(iquad)][
-                            max(x_min, x_slice.start) - x_min:min(x_max, x_slice.stop) - x_min,
-                            max(y_min, y_slice.start) - y_min:min(y_max, y_slice.stop) - y_min,
-                            z_slice.start:z_slice.stop]
+            data = np.empty(data_shape, dtype=self.dtype)
+            if not self._silent_load:
+                progress = ProgressBar(self.quad_nb)
+            for iquad in range(self.quad_nb):
                 if not self._silent_load:
-                    progress.end()
-                        
+                    progress.update(iquad, info='Loading data')
+                x_min, x_max, y_min, y_max = self._get_quadrant_dims(
+                    iquad, self.dimx, self.dimy, int(np.sqrt(float(self.quad_nb))))
+                # half-open intervals overlap test
+                if (x_slice.start < x_max and x_slice.stop > x_min
+                    and y_slice.start < y_max and y_slice.stop > y_min):
+                    # quad part is read directly into the output array
+                    ix_min = max(x_min, x_slice.start)
+                    ix_max = min(x_max, x_slice.stop)
+                    iy_min = max(y_min, y_slice.start)
+                    iy_max = min(y_max, y_slice.stop)
+                    self._get_hdf5_dataset(
+                        self._get_hdf5_quad_data_path(iquad)).read_direct(
+                            data,
+                            source_sel=np.s_[ix_min - x_min:ix_max - x_min,
+                                             iy_min - y_min:iy_max - y_min,
+                                             z_slice.start:z_slice.stop],
+                            dest_sel=np.s_[ix_min - x_slice.start:ix_max - x_slice.start,
+                                           iy_min - y_slice.start:iy_max - y_slice.start,
+                                           :])
+            if not self._silent_load:
+                progress.end()
+                    
 
         return np.squeeze(data)
 
@@ -506,13 +1001,13 @@ class HDFCube(Cube):
           only a warning is raised. If False the HDF5 cube is
           considered as invalid and an exception is raised.
         """
-        with orb.utils.io.open_hdf5(self.cube_path, 'r') as f:
-            if attr in f.attrs:
-                return f.attrs[attr]
+        f = self._get_hdf5f()
+        if attr in f.attrs:
+            return f.attrs[attr]
+        else:
+            if not optional:
+                raise Exception('Attribute {} is missing. The HDF5 cube seems badly formatted. Try to create it again with the last version of ORB.'.format(attr))
             else:
-                if not optional:
-                    raise Exception('Attribute {} is missing. The HDF5 cube seems badly formatted. Try to create it again with the last version of ORB.'.format(attr))
-                else:
-                    return None
-                   
+                return None
+               
 
@@ -27,11 +27,11 @@ import orb.utils.spectrum
 import orb.utils.vector
 import orb.utils.io
 import orb.utils.err
-import astropy.io.fits as pyfits
 
 import numpy as np
 import logging
-import scipy.optimize
+import functools
+import collections
 
 #################################################
 #### CLASS Photometry ###########################
@@ -39,9 +39,11 @@ import scipy.optimize
 class Photometry(object):
 
     STEP_NB = 2000
-    transmission_terms = ['atmosphere', 'mirror', 'optics', 'filter', 'telescope']
-    cameras = [0,1,2]
-    def __init__(self, filter_name, camera_index, instrument='sitelle', airmass=1):
+    PROJECTION_CACHE_SIZE = 8 # max number of axes with cached projection weights
+    transmission_terms = ('atmosphere', 'mirror', 'optics', 'filter', 'telescope')
+    cameras = (0, 1, 2)
+    def __init__(self, filter_name, camera_index, instrument='sitelle', airmass=1,
+                 dtype=np.float64):
         self.tools = orb.core.Tools(instrument=instrument)
         self.filter_name = filter_name
         if not camera_index in self.cameras:
@@ -53,6 +55,13 @@ class Photometry(object):
 
         self.airmass = float(airmass)
 
+        # dtype of the transmission vectors: calibration curves are
+        # not more precise than float32 which can be used to speed up
+        # computations
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind != 'f':
+            raise TypeError('dtype must be a floating point type')
+
         self.corr = orb.utils.spectrum.theta2corr(self.tools.config['OFF_AXIS_ANGLE_CENTER'])
         self.cm1_axis = orb.core.Axis(orb.utils.spectrum.create_cm1_axis(
             self.STEP_NB, self.step, self.order, corr=self.corr))
@@ -60,65 +69,141 @@ class Photometry(object):
 
         self.params = {'step': self.step, 'order':self.order, 'calib_coeff':self.corr,
                        'filter_file_path':self.filter_file.basic_path}
+
+        # transmission terms only depend on init parameters, they
+        # are computed once and stored as read-only np.ndarray
+        # defined on self.cm1_axis
+        self._transmissions = dict()
+        self._flux_scale = self._compute_flux_scale(self.cm1_axis.data)
+        self._projection_weights = collections.OrderedDict() # LRU cache
+
+    def _wrap(self, data):
+        """Return a Cm1Vector1d instance wrapping data defined on
+        self.cm1_axis.
+
+        :param data: 1d np.ndarray
+        """
+        return orb.core.Cm1Vector1d(
+            data, axis=np.copy(self.cm1_axis.data), params=self.params)
+
+    def _project_file(self, path):
+        """Return the data of a cm1 vector file projected on
+        self.cm1_axis.
+
+        :param path: Path to the vector file.
+        """
+        return np.array(orb.core.Cm1Vector1d(
+            path, params=self.params).project(self.cm1_axis).data.real,
+                        dtype=float)
+        
+    def _raw_transmission(self, tterm):
+        """Return a transmission term on self.cm1_axis as a read-only
+        np.ndarray. Terms are computed on first call.
+
+        :param tterm: Transmission term. Can be one of
+          transmission_terms or 'qe', '4rt' and 'unmodulated'.
+        """
+        if tterm in self._transmissions:
+            return self._transmissions[tterm]
         
-    def get_transmission(self, tterm):
-        if not tterm in self.transmission_terms:
-            raise ValueError('tterm must be in {}'.format(self.transmission_terms))
         if tterm == 'atmosphere':
-            atm = orb.core.Cm1Vector1d(self.tools._get_atmospheric_extinction_file_path(),
-                                   params=self.params).project(self.cm1_axis)
-            atm.data = orb.utils.photometry.ext2trans(atm.data, self.airmass)
-            return atm
+            data = orb.utils.photometry.ext2trans(self._project_file(
+                self.tools._get_atmospheric_extinction_file_path()), self.airmass)
         elif tterm == 'mirror':
-            return orb.core.Cm1Vector1d(self.tools._get_mirror_transmission_file_path(),
-                                   params=self.params).project(self.cm1_axis)
+            data = self._project_file(self.tools._get_mirror_transmission_file_path())
         elif tterm == 'optics':
-            return orb.core.Cm1Vector1d(self.tools._get_optics_file_path(self.filter_name),
-                                    params=self.params).project(self.cm1_axis)
+            data = self._project_file(self.tools._get_optics_file_path(self.filter_name))
         elif tterm == 'filter':
-            return self.filter_trans.copy()
+            data = np.array(self.filter_trans.data.real, dtype=float)
         elif tterm == 'telescope':
-            mtrans = self.get_transmission('mirror')
-            mtrans = mtrans.math('power', 2)
-            return mtrans
-
+            data = np.square(self._raw_transmission('mirror'))
+        elif tterm == 'qe':
+            if self.camera_index == 0:
+                data = self._project_file(self.tools._get_quantum_efficiency_file_path(1))
+                data += self._project_file(self.tools._get_quantum_efficiency_file_path(2))
+                data /= 2.
+            else:
+                data = self._project_file(
+                    self.tools._get_quantum_efficiency_file_path(self.camera_index))
+        elif tterm == '4rt':
+            data = self._project_file(self.tools._get_4rt_file_path())
+        elif tterm == 'unmodulated':
+            # the product is computed in place in a single buffer
+            data = np.copy(self._raw_transmission('atmosphere'))
+            for iterm in ('telescope', 'optics', 'filter', 'qe'):
+                np.multiply(data, self._raw_transmission(iterm), out=data)
+            if self.camera_index != 0:
+                data /= 2.
         else: raise NotImplementedError('{} not defined'.format(tterm))
+
+        data = np.asarray(data, dtype=self.dtype)
+        data.flags.writeable = False
+        self._transmissions[tterm] = data
+        return data
         
-    def get_unmodulated_transmission(self, eps=None):
-        trans = self.get_transmission('atmosphere')
-        trans = trans.multiply(self.get_transmission('telescope'))
-        trans = trans.multiply(self.get_transmission('optics'))
-        trans = trans.multiply(self.get_transmission('filter'))
-        trans = trans.multiply(self.get_qe())
-        if self.camera_index != 0:
-            trans = trans.math('divide', 2)
-        if eps is not None:    
-            if not isinstance(eps, orb.core.Cm1Vector1d):
-                try:
-                    eps = float(eps)
-                except Exception:
-                    raise TypeError('eps must be a orb.core.Cm1Vector1d instance or a float')
-            trans = trans.math('divide', eps)
-            
+    def get_transmission(self, tterm):
+        if not tterm in self.transmission_terms:
+            raise ValueError('tterm must be in {}'.format(self.transmission_terms))
+        return self._wrap(np.copy(self._raw_transmission(tterm)))
 
-        return trans
+    def _check_eps(self, eps):
+        """Check eps and convert it to a float if it is not a
+        Cm1Vector1d instance.
+
+        :param eps: Cm1Vector1d instance or float.
+        """
+        if not isinstance(eps, orb.core.Cm1Vector1d):
+            try:
+                eps = float(eps)
+            except Exception:
+                raise TypeError('eps must be a orb.core.Cm1Vector1d instance or a float')
+        return eps
+
+    def _get_transmission_data(self, modulated=True, eps=None,
+                               opd_jitter=None, wf_error=None):
+        """Return the total transmission on self.cm1_axis as a new
+        np.ndarray.
+
+        Uncertainties of eps are not propagated, use
+        get_unmodulated_transmission() or get_modulated_transmission()
+        to get them.
+        """
+        data = np.copy(self._raw_transmission('unmodulated'))
+        if eps is not None:
+            eps = self._check_eps(eps)
+            if isinstance(eps, orb.core.Cm1Vector1d):
+                if (eps.axis.data.size == self.cm1_axis.data.size
+                    and np.all(np.isclose(eps.axis.data, self.cm1_axis.data))):
+                    eps = eps.data.real
+                else:
+                    eps = eps.project(self.cm1_axis).data.real
+            data /= eps
+        if modulated:
+            data *= self._get_modulation_efficiency_data(
+                opd_jitter=opd_jitter, wf_error=wf_error)
+        return data
+        
+    def get_unmodulated_transmission(self, eps=None):
+        if eps is not None:
+            eps = self._check_eps(eps)
+            if isinstance(eps, orb.core.Cm1Vector1d):
+                # math is used to propagate uncertainties
+                return self._wrap(np.copy(self._raw_transmission(
+                    'unmodulated'))).math('divide', eps)
+        return self._wrap(self._get_transmission_data(
+            modulated=False, eps=eps))
 
     def get_modulated_transmission(self, eps=None, opd_jitter=None, wf_error=None):
         trans = self.get_unmodulated_transmission(eps=eps)
-        trans = trans.multiply(self.get_modulation_efficiency(
-            opd_jitter=opd_jitter, wf_error=wf_error))
+        me = self._get_modulation_efficiency_data(
+            opd_jitter=opd_jitter, wf_error=wf_error)
+        trans.data *= me
+        if trans.has_err():
+            trans.err *= me
         return trans
     
     def get_qe(self):
-        def qe(cam_index):
-            return orb.core.Cm1Vector1d(self.tools._get_quantum_efficiency_file_path(cam_index),
-                                    params=self.params).project(self.cm1_axis) 
-        if self.camera_index == 0:
-            qe1 = qe(1)
-            qe2 = qe(2)
-            return qe1.add(qe2).math('divide', 2)
-        else: 
-            return qe(self.camera_index) 
+        return self._wrap(np.copy(self._raw_transmission('qe')))
 
     def get_ccd_gain(self):
         if self.camera_index == 0:
@@ -126,18 +211,13 @@ class Photometry(object):
                     + self.tools.config['CAM2_GAIN']) / 2.
         return self.tools.config['CAM{}_GAIN'.format(self.camera_index)]
 
-    def get_modulation_efficiency(self, opd_jitter=None, wf_error=None):
-        """Return modulation efficiency
-
-        :param opd_jitter: OPD jitter in nm (standard deviation)
-
-        :param wf_error: wavefront error ratio (e.g. 1/30.)
+    def _get_modulation_efficiency_data(self, opd_jitter=None, wf_error=None):
+        """Return modulation efficiency on self.cm1_axis as a new
+        np.ndarray. See get_modulation_efficiency().
         """
-        
         if opd_jitter is None: opd_jitter = self.tools.config['OPD_JITTER']
         if wf_error is None: wf_error = self.tools.config['WF_ERROR']
-        rt4 = orb.core.Cm1Vector1d(self.tools._get_4rt_file_path(),
-                               params=self.params).project(self.cm1_axis)
+        rt4 = np.copy(self._raw_transmission('4rt'))
 
         me_opd_jitter= orb.utils.photometry.modulation_efficiency_opd_jitter(
             self.cm1_axis.data, opd_jitter)
@@ -145,9 +225,105 @@ class Photometry(object):
             self.cm1_axis.data, wf_error)
 
         # opd jitter me is squared because tip-tilt jitter gives the same me loss
-        rt4.data *= me_opd_jitter**2. * me_wf
+        # (products are made in place to avoid temporary arrays)
+        rt4 *= me_opd_jitter
+        rt4 *= me_opd_jitter
+        rt4 *= me_wf
         return rt4
+        
+    def get_modulation_efficiency(self, opd_jitter=None, wf_error=None):
+        """Return modulation efficiency
+
+        :param opd_jitter: OPD jitter in nm (standard deviation)
+
+        :param wf_error: wavefront error ratio (e.g. 1/30.)
+        """
+        return self._wrap(self._get_modulation_efficiency_data(
+            opd_jitter=opd_jitter, wf_error=wf_error))
     
+    def _compute_flux_scale(self, cm1_axis):
+        """Return the factor converting a flux in erg/cm2/s/A into a
+        flux in counts/s in each channel, transmission excluded.
+
+        :param cm1_axis: Axis in cm-1 (np.ndarray)
+        """
+        delta_cm1 = np.diff(cm1_axis)[0] # in cm-1, channels have the same width
+        nm_bins = orb.utils.spectrum.fwhm_cm12nm(delta_cm1, cm1_axis) # bins in nm
+        return (self.tools.config.MIR_SURFACE # photons/s/A
+                * self.get_ccd_gain() # counts/s/A
+                * nm_bins * 10. # counts/s in each channel
+                / orb.utils.photometry.compute_photon_energy(1e7/cm1_axis))
+    
+    def _get_projection_weights(self, cm1_axis):
+        """Return the weights of the linear interpolation of a vector
+        defined on self.cm1_axis onto another axis. Weights of the
+        last PROJECTION_CACHE_SIZE axes are cached.
+
+        :param cm1_axis: Axis in cm-1 (np.ndarray)
+
+        :return: a tuple (index, weight, outside). index is the index
+          of the lower neighbour, weight is the weight of the upper
+          neighbour and outside is True where the axis is out of
+          self.cm1_axis.
+        """
+        key = cm1_axis.tobytes()
+        if key in self._projection_weights:
+            self._projection_weights.move_to_end(key)
+            return self._projection_weights[key]
+        
+        axis = self.cm1_axis.data
+        pos = (cm1_axis - axis[0]) / self.cm1_axis.axis_step
+        # pos is computed from the axis step: points at the bounds of
+        # self.cm1_axis may be off by a rounding error
+        tol = 1e-6
+        outside = (pos < -tol) | (pos > axis.size - 1 + tol)
+        pos = np.clip(pos, 0, axis.size - 1)
+        index = np.clip(np.floor(pos).astype(int), 0, axis.size - 2)
+        weight = (pos - index).astype(self.dtype)
+        
+        self._projection_weights[key] = (index, weight, outside)
+        if len(self._projection_weights) > self.PROJECTION_CACHE_SIZE:
+            self._projection_weights.popitem(last=False)
+        return self._projection_weights[key]
+
+    def _get_counts_factor(self, cm1_axis, modulated=True, eps=None,
+                           opd_jitter=None, wf_error=None):
+        """Return the factor converting a flux in erg/cm2/s/A into a
+        flux in counts/s in each channel, transmission included, as a
+        new np.ndarray.
+
+        :param cm1_axis: Axis in cm-1 (np.ndarray)
+        """
+        # an axis equal to self.cm1_axis (e.g. the axis of a vector
+        # created from the same observation parameters) is replaced
+        # by self.cm1_axis so that cached values are used
+        if (cm1_axis is not self.cm1_axis.data
+            and cm1_axis.size == self.cm1_axis.data.size
+            and np.array_equal(cm1_axis, self.cm1_axis.data)):
+            cm1_axis = self.cm1_axis.data
+            
+        if cm1_axis is self.cm1_axis.data:
+            flux_scale = self._flux_scale
+        else:
+            flux_scale = self._compute_flux_scale(cm1_axis)
+        
+        trans = self._get_transmission_data(
+            modulated=modulated, eps=eps, opd_jitter=opd_jitter, wf_error=wf_error)
+
+        # transmission is defined on self.cm1_axis. It is projected
+        # with cached weights (equivalent to Vector1d.project which
+        # makes a linear interpolation) in a new array so that the
+        # conversion can be done in place, without temporary arrays
+        if cm1_axis is self.cm1_axis.data:
+            factor = trans
+        else:
+            index, weight, outside = self._get_projection_weights(cm1_axis)
+            factor = trans[index] * (1. - weight)
+            factor += trans[index + 1] * weight
+            factor[outside] = np.nan
+        factor *= flux_scale
+        return factor
+        
     def flux2counts(self, flux, modulated=True, eps=None, opd_jitter=None, wf_error=None):
         """
         convert a flux in erg/cm2/s/A to a flux in counts/s in both cameras
@@ -174,30 +350,68 @@ class Photometry(object):
             flux = float(flux)
             is_float=True
 
-        flux = np.atleast_1d(np.copy(flux))
-        flux = flux / orb.utils.photometry.compute_photon_energy(1e7/cm1_axis) # photons/cm2/s/A
-        flux *= self.tools.config.MIR_SURFACE # photons/s/A
-        if modulated:
-            flux *= self.get_modulated_transmission(
-                eps=eps, opd_jitter=opd_jitter, wf_error=wf_error).project(
-                    orb.core.Axis(cm1_axis)).data # electrons/s/A
+        counts = self._get_counts_factor(
+            cm1_axis, modulated=modulated, eps=eps,
+            opd_jitter=opd_jitter, wf_error=wf_error)
+        # counts/s in each channel. The product is made in place
+        # unless the flux is complex (e.g. an orb.fft.Spectrum), in
+        # which case the counts are complex too.
+        if np.iscomplexobj(flux):
+            counts = counts * flux
         else:
-            flux *= self.get_unmodulated_transmission(eps=eps).project(
-                orb.core.Axis(cm1_axis)).data # electrons/s/A
-        flux *= self.get_ccd_gain() # counts/s/A
+            counts *= flux
 
-        delta_cm1 = np.diff(cm1_axis)[0] # in cm-1, channels have the same width
-        nm_bins = orb.utils.spectrum.fwhm_cm12nm(delta_cm1, cm1_axis) # bins in nm
-
-        flux *= nm_bins * 10. # counts/s in each channel
-
-        flux = orb.core.Cm1Vector1d(flux, axis=cm1_axis, params=params)
+        flux = orb.core.Cm1Vector1d(counts, axis=cm1_axis, params=params)
         
         if not is_float:
             return flux
         else:
             return flux.mean_in_filter()
 
+    def flux2counts_batch(self, flux, cm1_axis=None, modulated=True, eps=None,
+                          opd_jitter=None, wf_error=None):
+        """Convert many fluxes in erg/cm2/s/A, defined on the same
+        axis, to fluxes in counts/s at once. See flux2counts().
+
+        :param flux: 2d np.ndarray of shape (M, N): M fluxes in
+          erg/cm2/s/A with N channels each.
+
+        :param cm1_axis: (Optional) Axis of the fluxes (an
+          orb.core.Axis instance or a 1d np.ndarray of size N). If
+          None, self.cm1_axis is used (default None).
+
+        :param modulated: (Optional) If True, modulation efficiency
+          is taken into account (default True).
+
+        :param eps: (Optional) Correction vector or factor (default
+          None).
+
+        :param opd_jitter: (Optional) OPD jitter in nm (standard
+          deviation).
+
+        :param wf_error: (Optional) wavefront error ratio (e.g. 1/30.)
+
+        :return: a 2d np.ndarray of shape (M, N) in counts/s in each
+          channel.
+        """
+        if cm1_axis is None:
+            cm1_axis = self.cm1_axis.data
+        elif isinstance(cm1_axis, orb.core.Axis):
+            cm1_axis = cm1_axis.data
+
+        # input dtype is kept (fluxes can be complex, see flux2counts)
+        flux = np.asarray(flux)
+        if flux.ndim != 2:
+            raise TypeError('flux must be a 2d array')
+        if flux.shape[1] != cm1_axis.size:
+            raise ValueError('flux must have {} channels but has {}'.format(
+                cm1_axis.size, flux.shape[1]))
+        
+        factor = self._get_counts_factor(
+            cm1_axis, modulated=modulated, eps=eps,
+            opd_jitter=opd_jitter, wf_error=wf_error)
+        return flux * factor[np.newaxis,:]
+
     def compute_flambda(self, cm1_axis, eps=None, modulated=True):
         """Compute the flambda calibration function from the correction vector.
 
@@ -210,14 +424,34 @@ class Photometry(object):
             np.ones_like(cm1_axis.data, dtype=float),
             axis=cm1_axis, filter_name=self.filter_name)
         # flux must be in erg/cm2/s/A
-        
-        f2c = self.flux2counts(flux, eps=eps, modulated=modulated)
-        f2c = f2c.math('power', -1)
-        xmin, xmax = f2c.get_filter_bandpass_pix()
-        f2c.data[:xmin] = f2c.data[xmin]
-        f2c.data[xmax:] = f2c.data[xmax]
-        return f2c
+        xmin, xmax = flux.get_filter_bandpass_pix()
+
+        # counts are only computed in the filter bandpass (for a flux
+        # of 1 they are equal to the conversion factor), outside, the
+        # values at the limits of the bandpass are used.
+        band_f2c = np.asarray(self._get_counts_factor(
+            np.copy(cm1_axis.data[xmin:xmax+1]), eps=eps, modulated=modulated),
+                              dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.reciprocal(band_f2c, out=band_f2c)
+
+        f2c = np.empty_like(flux.data)
+        f2c[:xmin] = band_f2c[0]
+        f2c[xmin:xmax+1] = band_f2c
+        f2c[xmax+1:] = band_f2c[-1]
+        return orb.core.Cm1Vector1d(f2c, axis=cm1_axis.data, params=flux.params)
+
+
+@functools.lru_cache(maxsize=16)
+def _get_photometry(filter_name, camera_index, instrument, airmass):
+    """Return a Photometry instance shared by all the calls made
+    with the same arguments.
 
+    Photometry only caches data depending on its init parameters,
+    so an instance can be safely reused.
+    """
+    return Photometry(filter_name, camera_index, instrument=instrument,
+                      airmass=airmass)
 
 
 #################################################
@@ -259,6 +493,23 @@ class Standard(orb.core.Tools):
         return (os.curdir + os.sep + 'STANDARD' + os.sep
                 + 'STD' + '.')
 
+    def _read_dat_columns(self, file_path):
+        """Read the two first columns of a standard dat file, which is
+        read only once. Lines containing a '#' are comments.
+
+        :param file_path: Path to the dat file.
+
+        :return: a tuple (data, comments). data is an array of shape
+          (n, 2) and comments is the list of the comment lines.
+        """
+        with orb.utils.io.open_file(file_path, 'r') as std_file:
+            lines = std_file.readlines()
+        comments = [line for line in lines if '#' in line]
+        # data lines are parsed by numpy (empty lines are skipped)
+        data = np.loadtxt([line for line in lines if '#' not in line],
+                          usecols=(0, 1), ndmin=2, dtype=float)
+        return data, comments
+
     def _read_oke_dat(self, file_path):
         """Read a data file from Oke J. B., Faint spectrophotometric
         standards, AJ, (1990) and return a tuple of arrays (wavelength,
@@ -269,19 +520,14 @@ class Standard(orb.core.Tools):
 
         :param file_path: Path to the Oke dat file ('fXX.dat').
         """
-        std_file = orb.utils.io.open_file(file_path, 'r')
-        
-        spec_ang = list()
-        spec_flux = list()
-        for line in std_file:
-             line = line.split()
-             spec_ang.append(line[0])
-             spec_flux.append(line[1])
-
-        spec_ang = np.array(spec_ang, dtype=float)
-        spec_flux = np.array(spec_flux, dtype=float) * 1e-16
-
-        spec_res = spec_ang / np.where(spec_ang > 4700, 2., 1.)
+        data, _ = self._read_dat_columns(file_path)
+        spec_ang, spec_flux = data.T
+        spec_flux *= 1e-16
+
+        # resolution is built in place from the inverse of the fwhm
+        spec_res = np.ones_like(spec_ang)
+        spec_res[spec_ang > 4700] = 1/2.
+        spec_res *= spec_ang
         return spec_ang, spec_flux, spec_res
 
     def _read_massey_dat(self, file_path):
@@ -295,37 +541,32 @@ class Standard(orb.core.Tools):
         :param file_path: Path to the Massey dat file (generally
           'spXX.dat').
         """
-        std_file = orb.utils.io.open_file(file_path, 'r')
+        data, comments = self._read_dat_columns(file_path)
+        spec_ang, spec_mag = data.T
         
-        spec_ang = list()
-        spec_mag = list()
+        # the instrument is given in the comments
         inst = 'IRS'
-        for line in std_file:
-            if '#' in line:
-                if 'IIDS' in line:
-                    inst = 'IIDS'
-                elif 'BOTH' in line:
-                    inst = 'both'
-                
-                continue
-            line = line.split()
-            spec_ang.append(line[0])
-            spec_mag.append(line[1])
-
-        spec_ang = np.array(spec_ang, dtype=float)
-        spec_mag = np.array(spec_mag, dtype=float)
+        for line in comments:
+            if 'IIDS' in line:
+                inst = 'IIDS'
+            elif 'BOTH' in line:
+                inst = 'both'
         
         # convert mag to flux in erg/cm^2/s/A
         spec_flux = orb.utils.photometry.ABmag2flambda(spec_mag, spec_ang)
 
         if inst == 'both': # combined IRS + IIDS, worst resolution is assumed
             # 7 A resolution < 5000 A
-            spec_res = spec_ang / np.where(spec_ang > 5000, 14, 10)     
+            spec_res = np.full_like(spec_ang, 1/10.)
+            spec_res[spec_ang > 5000] = 1/14.
+            spec_res *= spec_ang
         elif inst == 'IRS':
             spec_res = spec_ang / 10 # 10 A resolution everywhere
         elif inst == 'IIDS':
             # 7 A resolution < 5000 A
-            spec_res = spec_ang / np.where(spec_ang > 5000, 14, 7)
+            spec_res = np.full_like(spec_ang, 1/7.)
+            spec_res[spec_ang > 5000] = 1/14.
+            spec_res *= spec_ang
         else: raise Exception('inst must be both, IRS or IIDS, not {}'.format(inst))
         
             
@@ -341,20 +582,26 @@ class Standard(orb.core.Tools):
         :param file_path: Path to the Massey dat file (generally
           'spXX.dat').
         """
-        hdu = pyfits.open(file_path)
-        hdr = hdu[1].header
-        data = hdu[1].data
+        import astropy.io.fits as pyfits # only needed for CALSPEC files
+        
+        # columns are converted from the memory mapped file (FITS data
+        # is big endian) to native float arrays with a single copy,
+        # before the file is closed
+        with pyfits.open(file_path, memmap=True) as hdu:
+            hdr = hdu[1].header
+            data = hdu[1].data
 
-        logging.info('Calspec file flux unit: %s'%hdr['TUNIT2'])
+            logging.info('Calspec file flux unit: %s'%hdr['TUNIT2'])
         
-        # wavelength is in A
-        spec_ang = np.array(data['WAVELENGTH'])
+            # wavelength is in A
+            spec_ang = np.array(data['WAVELENGTH'], dtype=np.float64)
         
-        # flux is in erg/cm2/s/A
-        spec_flux = np.array(data['FLUX'])
+            # flux is in erg/cm2/s/A
+            spec_flux = np.array(data['FLUX'], dtype=np.float64)
         
-        # resolution
-        spec_res =  np.array(data['WAVELENGTH'] / data['FWHM'])
+            # resolution
+            spec_res = np.array(data['FWHM'], dtype=np.float64)
+            np.divide(spec_ang, spec_res, out=spec_res)
 
         return spec_ang, spec_flux, spec_res
 
@@ -373,13 +620,20 @@ class Standard(orb.core.Tools):
         axis = cm1_axis.data
         old_axis = orb.utils.spectrum.nm2cm1(self.ang / 10.)
 
-        resolution_cm1 = orb.utils.vector.interpolate_axis(
-            self.resolution, axis, 3, old_axis=old_axis)
+        if np.any(np.isnan(self.resolution)) or np.any(np.isnan(self.flux)):
+            # NaNs are removed independently from each vector
+            resolution_cm1 = orb.utils.vector.interpolate_axis(
+                self.resolution, axis, 3, old_axis=old_axis)
+            flux_cm1 = orb.utils.vector.interpolate_axis(
+                self.flux, axis, 3, old_axis=old_axis)
+        else:
+            # resolution and flux share the same spline
+            resolution_cm1, flux_cm1 = orb.utils.vector.cubic_interpolate_axis(
+                np.column_stack((self.resolution, self.flux)), axis, old_axis).T
 
         params = {'filter_file_path':ff.basic_path, 'resolution':resolution_cm1}
 
-        spec = orb.core.Cm1Vector1d(orb.utils.vector.interpolate_axis(
-            self.flux, axis, 3, old_axis=old_axis), axis=axis, params=params)
+        spec = orb.core.Cm1Vector1d(flux_cm1, axis=axis, params=params)
 
         return spec
 
@@ -402,9 +656,8 @@ class Standard(orb.core.Tools):
         
         spe = self.get_spectrum(filter_name, cm1_axis)
         
-        photom = Photometry(filter_name, camera_index,
-                            instrument=self.instrument,
-                            airmass=airmass)
+        photom = _get_photometry(filter_name, camera_index,
+                                 self.instrument, float(airmass))
         
         spe = photom.flux2counts(spe, modulated=modulated,
                                  opd_jitter=opd_jitter,
@@ -1100,11 +1100,15 @@ def bin_image(a, binning):
     return a / (binning**2.)
 
 
-def nanbin_image(im, binning):
+def nanbin_image(im, binning, out=None):
     """Mean image (or cube) binning robust to NaNs.
 
     :param im: Image or cube to bin
     :param binning: Binning factor (must be an integer)
+    :param out: (Optional) Array in which the binned image is
+      written. Must have the shape of the binned image (or of the
+      binned cube) and may be a view (e.g. a frame of a larger cube)
+      (default None).
 
     .. note:: adapted from https://stackoverflow.com/questions/6163334/binning-data-in-python-with-scipy-numpy.
     """
@@ -1112,14 +1116,22 @@ def nanbin_image(im, binning):
     if not im.ndim in [2, 3]: raise ValueError('Array dimensions must be 2 or 3')
     s0 = int(im.shape[0]//binning)
     s1 = int(im.shape[1]//binning)
-    im_view = np.copy(im[:s0 * binning, :s1 * binning, ...])
+    im_view = im[:s0 * binning, :s1 * binning, ...]
     if im_view.size > 0:
-        im_view = im_view.reshape(int(im.shape[0]//binning), binning,
-                                  int(im.shape[1]//binning), binning,
-                                  -1)
-        return np.squeeze(np.nanmean(np.nanmean(im_view, axis=3), axis=1))
+        im_view = im_view.reshape(s0, binning, s1, binning, -1)
+        if out is None:
+            return np.squeeze(np.nanmean(np.nanmean(im_view, axis=3), axis=1))
+        # a view is required to write in place: setting the shape
+        # raises an error if a copy would be needed
+        out_view = out.view()
+        out_view.shape = (s0, s1, im_view.shape[-1])
+        np.nanmean(np.nanmean(im_view, axis=3), axis=1, out=out_view)
+        return out
     else:
-        return np.nanmean(im).reshape((1,1))
+        if out is None:
+            return np.nanmean(im).reshape((1,1))
+        out[...] = np.nanmean(im)
+        return out
 
 def nn_interpolate(A, new_size):
     """Vectorized Nearest Neighbor Interpolation
@@ -313,6 +313,37 @@ def interpolate_axis(a, new_axis, deg, old_axis=None, fill_value=np.nan):
     result[np.nonzero(new_axis < np.min(old_axis))] = fill_value
     return result
 
+def cubic_interpolate_axis(a, new_axis, old_axis, fill_value=np.nan):
+    """Cubic interpolation of one or more real vectors defined on the
+    same axis.
+
+    Gives the same result as :py:meth:`interpolate_axis` with deg=3
+    (interpolating spline with not-a-knot conditions) but the spline
+    is built once for all the vectors. Vectors must not contain
+    NaNs.
+
+    :param a: vector or 2d array of shape (n, m) containing m
+      vectors of size n.
+    
+    :param new_axis: Interpolation axis
+    
+    :param old_axis: Original vector axis (can be decreasing).
+
+    :param fill_value: (Optional) extrapolated points are filled with
+      this value (default np.nan)
+    """
+    old_axis = np.asarray(old_axis, dtype=np.float64)
+    new_axis = np.asarray(new_axis, dtype=np.float64)
+    if old_axis[0] > old_axis[-1]:
+        old_axis = old_axis[::-1]
+        a = a[::-1]
+
+    result = interpolate.CubicSpline(old_axis, a, axis=0)(new_axis)
+
+    # extrapolated parts are set to fill_value
+    result[(new_axis > old_axis[-1]) | (new_axis < old_axis[0])] = fill_value
+    return result
+
 
 def robust_unwrap(vec, dis):
     """Unwrap a vector with a given discontinuity. Robust to nans.